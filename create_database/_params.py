@@ -1,3 +1,5 @@
+import numpy as np
+
 famafrench_identifiers_dict = {
                                (3, "M"): "F-F_Research_Data_Factors",
                                (5, "M"): "F-F_Research_Data_5_Factors_2x3",
@@ -5,3 +7,15 @@ famafrench_identifiers_dict = {
                                (5, "D"): "F-F_Research_Data_5_Factors_2x3_daily"
                               }
 
+
+# CRSP primary exchange codes -> exchange names (anything else is "Other")
+crsp_exchange_dict = {"N": "NYSE", "A": "AMEX", "Q": "NASDAQ"}
+crsp_exchange_categories = ["NYSE", "AMEX", "NASDAQ", "Other"]
+
+# SIC codes -> broad industries. `sic_industry_edges` are the left edges of the SIC ranges and
+# `sic_industry_codes` gives the category index of each np.searchsorted(..., side="right") bucket;
+# the gaps (1800-1999, 6800-6999) and values outside 1-9999 map to "Missing".
+sic_industry_categories = ["Agriculture", "Mining", "Construction", "Manufacturing", "Transportation", "Utilities",
+                           "Wholesale", "Retail", "Finance", "Services", "Public", "Missing"]
+sic_industry_edges = np.array([1, 1000, 1500, 1800, 2000, 4000, 4900, 5000, 5200, 6000, 6800, 7000, 9000, 10000])
+sic_industry_codes = np.array([11, 0, 1, 2, 11, 3, 4, 5, 6, 7, 8, 11, 9, 10, 11], dtype=np.int8)
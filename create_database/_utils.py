@@ -1,7 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from datetime import datetime
-from typing import Union
+from pathlib import Path
+from typing import Callable, Optional, Union, Tuple, List
+from _params import (
+    crsp_exchange_dict, crsp_exchange_categories,
+    sic_industry_categories, sic_industry_edges, sic_industry_codes
+)
 
 import pandas as pd
+import numpy as np
+import sqlalchemy
+import sqlite3
+import threading
+import hashlib
+import time
+import io
+import os
+
+try:  # optional Arrow bulk-load path for write_to_sqlite
+    import adbc_driver_sqlite.dbapi as adbc_sqlite
+    import pyarrow as pa
+except ImportError:
+    adbc_sqlite = None
+
+
+@lru_cache(maxsize=256)
+def _parse_date_string(date_string: str) -> datetime:
+    """Parses a 'YYYY-MM-DD' string; memoized since every reader converts the same start/final dates."""
+
+    # fromisoformat is a specialised C parser, but it also accepts other ISO-8601 shapes (times, week dates),
+    # so enforce the exact 'YYYY-MM-DD' layout first.
+    if len(date_string) != 10 or date_string[4] != "-" or date_string[7] != "-" \
+            or not date_string.replace("-", "").isdigit():
+        raise ValueError(f"Invalid date string: {date_string!r}")
+    return datetime.fromisoformat(date_string)
 
 
 def convert_to_datetime(date_value: Union[str, datetime], param_name: str) -> datetime:
@@ -58,26 +91,32 @@ def convert_to_datetime(date_value: Union[str, datetime], param_name: str) -> da
         return date_value  # Already a datetime, return as is
     elif isinstance(date_value, str):
         try:
-            return datetime.strptime(date_value, "%Y-%m-%d")  # Convert string to datetime
+            return _parse_date_string(date_value)  # Convert string to datetime
         except ValueError:
             raise ValueError(f"Invalid {param_name} format. Use 'YYYY-MM-DD'.")
     else:
         raise TypeError(f"{param_name} must be either a datetime object or a string in 'YYYY-MM-DD' format.")
 
 
-def get_annual_compustat_query(start_date: datetime, final_date: datetime) -> str:
+def get_annual_compustat_query(start_date: datetime, final_date: datetime) -> Tuple[str, dict]:
     """
-        Generates an SQL query to retrieve annual Compustat data from WRDS.
+        Generates an SQL query to retrieve annual Compustat data from WRDS, with book equity and
+        operating profitability computed on the server.
 
         Args:
             start_date (datetime): The start date for filtering the data.
             final_date (datetime): The end date for filtering the data.
 
         Returns:
-            str: An SQL query string to fetch annual Compustat data.
+            Tuple[str, dict]: An SQL query string to fetch annual Compustat data and the parameters bound to
+                its `%(start_date)s` / `%(final_date)s` placeholders.
 
         Notes:
-            - The query selects key financial variables from the `comp.funda` table.
+            - The query returns `gvkey`, `datadate`, `at`, `be` and `op` from the `comp.funda` table.
+            - `be` (Book Equity) is shareholders' equity (`seq`, else `ceq + pstk`, else `at - lt`) plus
+              deferred taxes (`txditc`, else `txdb + itcb`, else 0) minus preferred stock (`pstkrv`, else
+              `pstkl`, else `pstk`, else 0); non-positive values are returned as NULL.
+            - `op` (Operating Profitability) is `sale` minus `cogs`, `xsga` and `xint` (missing as 0), scaled by `be`.
             - Filters applied:
                 - `indfmt = 'INDL'`: Industrial format data.
                 - `datafmt = 'STD'`: Standardized data.
@@ -87,18 +126,28 @@ def get_annual_compustat_query(start_date: datetime, final_date: datetime) -> st
     """
 
     compustat_query = (
-        "SELECT gvkey, datadate, seq, ceq, at, lt, txditc, txdb, itcb,  pstkrv, pstkl, pstk, sale, cogs, xint, xsga "
-        "FROM comp.funda "
-        "WHERE indfmt = 'INDL' "
-            "AND datafmt = 'STD' "
-            "AND consol = 'C' "
-            "AND curcd = 'USD' "
-            f"AND datadate BETWEEN '{start_date}' AND '{final_date}'"
+        "SELECT gvkey, datadate, at, "
+                "CASE WHEN be > 0 THEN be END AS be, "
+                "CASE WHEN be > 0 THEN op_numerator / be END AS op "
+        "FROM ("
+            "SELECT gvkey, datadate, at, "
+                    "COALESCE(seq, ceq + pstk, at - lt) "
+                    "+ COALESCE(txditc, txdb + itcb, 0) "
+                    "- COALESCE(pstkrv, pstkl, pstk, 0) AS be, "
+                    "sale - COALESCE(cogs, 0) - COALESCE(xsga, 0) - COALESCE(xint, 0) AS op_numerator "
+            "FROM comp.funda "
+            "WHERE indfmt = 'INDL' "
+                "AND datafmt = 'STD' "
+                "AND consol = 'C' "
+                "AND curcd = 'USD' "
+                "AND datadate BETWEEN %(start_date)s AND %(final_date)s"
+        ") AS funda"
     )
-    return compustat_query
+    params = {"start_date": start_date.strftime("%Y-%m-%d"), "final_date": final_date.strftime("%Y-%m-%d")}
+    return compustat_query, params
 
 
-def get_crsp_query(start_date: datetime, final_date: datetime) -> str:
+def get_crsp_query(start_date: datetime, final_date: datetime) -> Tuple[str, dict]:
     """
         Constructs an SQL query to retrieve monthly CRSP stock data for a specified date range.
 
@@ -120,7 +169,8 @@ def get_crsp_query(start_date: datetime, final_date: datetime) -> str:
             final_date (datetime): The end date for data retrieval (inclusive).
 
         Returns:
-            str: A formatted SQL query string for retrieving CRSP data within the given date range.
+            Tuple[str, dict]: An SQL query string for retrieving CRSP data within the given date range and the
+                parameters bound to its `%(start_date)s` / `%(final_date)s` placeholders.
         """
 
     crsp_monthly_query = (
@@ -129,7 +179,7 @@ def get_crsp_query(start_date: datetime, final_date: datetime) -> str:
         "FROM crsp.msf_v2 AS msf "
         "INNER JOIN crsp.stksecurityinfohist AS ssih "
         "ON msf.permno = ssih.permno AND ssih.secinfostartdt <= msf.mthcaldt AND msf.mthcaldt <= ssih.secinfoenddt "
-        f"WHERE msf.mthcaldt BETWEEN '{start_date}' AND '{final_date}' "
+        "WHERE msf.mthcaldt BETWEEN %(start_date)s AND %(final_date)s "
             "AND ssih.sharetype = 'NS' "
             "AND ssih.securitytype = 'EQTY' "
             "AND ssih.securitysubtype = 'COM' "
@@ -139,11 +189,12 @@ def get_crsp_query(start_date: datetime, final_date: datetime) -> str:
             "AND ssih.conditionaltype in ('RW', 'NW') "
             "AND ssih.tradingstatusflg = 'A'"
     )
-    return crsp_monthly_query
+    params = {"start_date": start_date.strftime("%Y-%m-%d"), "final_date": final_date.strftime("%Y-%m-%d")}
+    return crsp_monthly_query, params
 
 def get_daily_crsp_query(start_date: datetime,
                          final_date: datetime,
-                         permno_string: str) -> str:
+                         permnos: List[int]) -> Tuple[str, dict]:
     """
         Constructs an SQL query to retrieve daily CRSP stock data for a specified date range and list of stocks.
 
@@ -157,13 +208,16 @@ def get_daily_crsp_query(start_date: datetime,
             - `date`: Daily timestamp.
             - `ret`: Daily stock return.
 
+        Rows are ordered by `permno` and `date`.
+
         Args:
             start_date (datetime): The start date for data retrieval (inclusive).
             final_date (datetime): The end date for data retrieval (inclusive).
-            permno_string (str): A formatted string containing a list of PERMNO stock identifiers.
+            permnos (List[int]): PERMNO stock identifiers, bound as an array to `%(permnos)s`.
 
         Returns:
-            str: A formatted SQL query string for retrieving CRSP daily data within the given date range.
+            Tuple[str, dict]: An SQL query string for retrieving CRSP daily data within the given date range and
+                the parameters bound to its placeholders.
         """
 
     crsp_daily_sub_query = (
@@ -173,8 +227,8 @@ def get_daily_crsp_query(start_date: datetime,
         "ON dsf.permno = ssih.permno AND "
         "ssih.secinfostartdt <= dsf.dlycaldt AND "
         "dsf.dlycaldt <= ssih.secinfoenddt "
-        f"WHERE dsf.permno IN {permno_string} "
-            f"AND dlycaldt BETWEEN '{start_date}' AND '{final_date}' "
+        "WHERE dsf.permno = ANY(%(permnos)s) "
+            "AND dlycaldt BETWEEN %(start_date)s AND %(final_date)s "
             "AND ssih.sharetype = 'NS' "
             "AND ssih.securitytype = 'EQTY' "
             "AND ssih.securitysubtype = 'COM' "
@@ -182,39 +236,223 @@ def get_daily_crsp_query(start_date: datetime,
             "AND ssih.issuertype in ('ACOR', 'CORP') "
             "AND ssih.primaryexch in ('N', 'A', 'Q') "
             "AND ssih.conditionaltype in ('RW', 'NW') "
-            "AND ssih.tradingstatusflg = 'A'"
+            "AND ssih.tradingstatusflg = 'A' "
+        "ORDER BY dsf.permno, dlycaldt"
     )
-    return crsp_daily_sub_query
+    params = {"start_date": start_date.strftime("%Y-%m-%d"), "final_date": final_date.strftime("%Y-%m-%d"), "permnos": permnos}
+    return crsp_daily_sub_query, params
+
+def read_sql_in_chunks(engine: sqlalchemy.engine.base.Engine,
+                       sql: str,
+                       params: dict,
+                       chunksize: int = 50_000,
+                       **read_sql_kwargs) -> pd.DataFrame:
+    """
+        Runs a query on a server-side cursor and builds the result DataFrame chunk by chunk.
+
+        With `stream_results=True` the database driver keeps the result set on the server and hands over
+        `chunksize` rows at a time, so the client never buffers the whole raw result next to the DataFrame
+        built from it.
+
+        Args:
+            engine (sqlalchemy.engine.base.Engine): WRDS database connection engine.
+            sql (str): The SQL query, with `%(name)s` placeholders.
+            params (dict): Parameters bound to the query placeholders.
+            chunksize (int): Number of rows fetched and converted per chunk.
+            **read_sql_kwargs: Passed through to `pd.read_sql_query` (e.g. `dtype`, `parse_dates`).
+
+        Returns:
+            pd.DataFrame: The full query result.
+    """
+
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as connection:
+        chunks = pd.read_sql_query(sql=sql, con=connection, params=params, chunksize=chunksize, **read_sql_kwargs)
+        return pd.concat(chunks, ignore_index=True)
+
+def read_with_parquet_cache(name: str,
+                            fetch: Callable[[], pd.DataFrame],
+                            *key_parts,
+                            max_age: Optional[float] = None) -> pd.DataFrame:
+    """
+        Returns the DataFrame produced by `fetch`, caching it as a local Parquet file.
+
+        The file is keyed by `name` and a hash of `key_parts` (e.g. the SQL text and its parameters), so a
+        changed query or date window misses the cache instead of reading stale rows. Files live in
+        `~/.cache/ff3v`, or in the directory named by the `FF3V_CACHE_DIR` environment variable; delete
+        them to force a fresh download.
+
+        Args:
+            name (str): Prefix of the cache file name (e.g. "compustat").
+            fetch (Callable[[], pd.DataFrame]): Called on a cache miss to retrieve the data.
+            *key_parts: Values that identify the request; their `repr` is hashed into the file name.
+            max_age (Optional[float]): Seconds after which a cached file is refetched, for sources that are
+                revised in place. `None` keeps the file until it is deleted.
+
+        Returns:
+            pd.DataFrame: The cached or freshly fetched data.
+    """
+
+    key = hashlib.sha1(repr(key_parts).encode()).hexdigest()[:12]
+    cache_dir = Path(os.getenv("FF3V_CACHE_DIR", "~/.cache/ff3v")).expanduser()
+    path = cache_dir / f"{name}_{key}.parquet"
+    if path.exists() and (max_age is None or time.time() - path.stat().st_mtime < max_age):
+        return pd.read_parquet(path)
+
+    df = fetch()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # The thread id keeps concurrent fetches of one key in the same process (e.g. the FF downloads) apart
+    temp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    df.to_parquet(temp_path, compression="zstd")
+    temp_path.replace(path)  # readers never see a half-written file
+    return df
+
+def copy_query_to_csv(engine: sqlalchemy.engine.base.Engine, sql: str, params: dict) -> io.BytesIO:
+    """
+        Runs a query through PostgreSQL's `COPY ... TO STDOUT` and returns its result as an in-memory CSV.
+
+        COPY sends the rows as one CSV byte stream, so no per-row Python objects are built by the database
+        driver or SQLAlchemy; the bytes are then parsed by `pd.read_csv`. COPY takes no bind parameters, so
+        `params` are rendered into the statement by psycopg2's `mogrify`, which quotes them as the driver would.
+
+        Args:
+            engine (sqlalchemy.engine.base.Engine): WRDS database connection engine (psycopg2 driver).
+            sql (str): The SQL query, with `%(name)s` placeholders.
+            params (dict): Parameters bound to the query placeholders.
+
+        Returns:
+            io.BytesIO: The query result as CSV with a header row, positioned at the start.
+    """
 
-def get_ccm_linking_table_query():
+    buffer = io.BytesIO()
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            statement = cursor.mogrify(sql, params).decode()
+            cursor.copy_expert(f"COPY ({statement}) TO STDOUT WITH CSV HEADER", buffer)
+    finally:
+        connection.close()  # back to the pool
+    buffer.seek(0)
+    return buffer
+
+def fetch_daily_crsp(engine: sqlalchemy.engine.base.Engine,
+                     start_date: datetime,
+                     final_date: datetime,
+                     permnos: List[int],
+                     risk_free: pd.Series,
+                     chunk_size: int = 500,
+                     max_workers: int = 8,
+                     rows_per_read: int = 200_000) -> pd.DataFrame:
     """
-        Constructs an SQL query to retrieve the CRSP-Compustat linking table.
+        Fetches daily CRSP excess returns for a list of stocks by running chunked queries concurrently.
 
-        This function generates an SQL query to extract the mapping between CRSP's `permno`
-        identifiers and Compustat's `gvkey` identifiers from the CRSP-Compustat Merged (CCM) link table.
+        The PERMNO list is split into chunks of `chunk_size` identifiers, and each chunk is fetched with its own
+        parameterized `get_daily_crsp_query` on a separate pooled connection, so several WRDS round-trips are in
+        flight at once. The engine's pool should allow at least `max_workers` connections.
+
+        Each query result arrives as CSV through `copy_query_to_csv` and is parsed `rows_per_read` rows at a
+        time; every piece is reduced to `permno`, `date` and a float32 `ret_excess` before the next one is
+        parsed, so the raw `ret` column and the joined risk-free rate never exist for the whole panel at once.
+
+        Args:
+            engine (sqlalchemy.engine.base.Engine): WRDS database connection engine.
+            start_date (datetime): The start date for data retrieval (inclusive).
+            final_date (datetime): The end date for data retrieval (inclusive).
+            permnos (List[int]): PERMNO stock identifiers to fetch.
+            risk_free (pd.Series): Daily risk-free rate indexed by date.
+            chunk_size (int): Number of PERMNOs per query.
+            max_workers (int): Number of queries executed concurrently.
+            rows_per_read (int): Number of CSV rows parsed and reduced per piece.
+
+        Returns:
+            pd.DataFrame: Daily int32 `permno`, `date` and `ret_excess` rows (`ret - rf`, floored at -1; rows with a
+                missing return dropped), sorted by `permno` and `date`. Each query returns its rows in that order
+                and the batches cover consecutive ranges of the sorted PERMNO list, so no client-side sort is needed.
+    """
+
+    def fetch_chunk(permno_chunk: List[int]) -> List[pd.DataFrame]:
+        query, params = get_daily_crsp_query(start_date, final_date, permno_chunk)
+        csv_buffer = copy_query_to_csv(engine, query, params)
+        pieces = []
+        for crsp_daily_sub in pd.read_csv(csv_buffer, chunksize=rows_per_read,
+                                          dtype={"permno": "int32", "ret": "float64"}, parse_dates=["date"]):
+            crsp_daily_sub = crsp_daily_sub.dropna()
+            ret_excess = (crsp_daily_sub["ret"] - crsp_daily_sub["date"].map(risk_free)).clip(lower=-1)
+            pieces.append(pd.DataFrame({"permno": crsp_daily_sub["permno"],
+                                        "date": crsp_daily_sub["date"],
+                                        "ret_excess": ret_excess.astype("float32")}))
+        return pieces
+
+    permnos = sorted(permnos)
+    chunks = [permnos[i:i + chunk_size] for i in range(0, len(permnos), chunk_size)]
+
+    batch_pieces = [[] for _ in chunks]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_chunk, permno_chunk): i for i, permno_chunk in enumerate(chunks)}
+        for j, future in enumerate(as_completed(futures), start=1):
+            batch_pieces[futures[future]] = future.result()
+            print(f"Batch {j} out of {len(chunks)} done ({(j / len(chunks)) * 100:.2f}%)")
+
+    # Concatenate in PERMNO order rather than completion order
+    return pd.concat([piece for pieces in batch_pieces for piece in pieces if not piece.empty], ignore_index=True)
+
+def get_ccm_joined_crsp_query(start_date: datetime, final_date: datetime) -> Tuple[str, dict]:
+    """
+        Constructs an SQL query that links monthly CRSP observations to Compustat firms.
+
+        The CRSP-Compustat Merged (CCM) link table is joined to the monthly CRSP stock file on the server,
+        including the link validity window, so only the (`permno`, `date`, `gvkey`) triples that are valid
+        for the requested CRSP slice are returned instead of the full link table.
 
         The query extracts the following fields:
             - `permno`: Unique stock identifier from CRSP.
+            - `date`: Monthly timestamp (truncated to month level), matching `get_crsp_query`.
             - `gvkey`: Unique firm identifier from Compustat.
-            - `linkdt`: Start date of the link.
-            - `linkenddt`: End date of the link (or current date if missing).
 
         The query filters to retain only active and relevant links by selecting:
             - `linktype` values `LU` (Link Update) and `LC` (Link Current).
             - `linkprim` values `P` (Primary) and `C` (Current).
+            - months between `linkdt` and `linkenddt` (or the current date if the link is still active).
 
         Args:
-            None
+            start_date (datetime): The start date for data retrieval (inclusive).
+            final_date (datetime): The end date for data retrieval (inclusive).
 
         Returns:
-            str: A formatted SQL query string for retrieving the CRSP-Compustat linking table.
+            Tuple[str, dict]: An SQL query string for retrieving the CRSP-Compustat links and the parameters
+                bound to its `%(start_date)s` / `%(final_date)s` placeholders.
     """
 
-    ccm_linking_table_query = (
-        "SELECT lpermno AS permno, gvkey, linkdt, COALESCE(linkenddt, CURRENT_DATE) AS linkenddt "
-        "FROM crsp.ccmxpf_linktable WHERE linktype IN ('LU', 'LC') AND linkprim IN ('P', 'C')"
+    ccm_joined_crsp_query = (
+        "SELECT msf.permno, date_trunc('month', msf.mthcaldt)::date AS date, ccm.gvkey "
+        "FROM crsp.msf_v2 AS msf "
+        "INNER JOIN crsp.ccmxpf_linktable AS ccm "
+        "ON msf.permno = ccm.lpermno "
+            "AND date_trunc('month', msf.mthcaldt)::date BETWEEN ccm.linkdt AND COALESCE(ccm.linkenddt, CURRENT_DATE) "
+        "WHERE msf.mthcaldt BETWEEN %(start_date)s AND %(final_date)s "
+            "AND ccm.linktype IN ('LU', 'LC') "
+            "AND ccm.linkprim IN ('P', 'C') "
+            "AND ccm.gvkey IS NOT NULL"
     )
-    return ccm_linking_table_query
+    params = {"start_date": start_date.strftime("%Y-%m-%d"), "final_date": final_date.strftime("%Y-%m-%d")}
+    return ccm_joined_crsp_query, params
+
+def pack_permno_date_keys(df: pd.DataFrame) -> np.ndarray:
+    """
+        Packs each row's (`permno`, `date`) pair into a single int64 join key.
+
+        The permno fills the high 32 bits and the day count (offset to stay non-negative) the low 32 bits, so the
+        keys sort exactly like the frame sorted by `permno` and `date`, and one integer column replaces a
+        two-column (integer, datetime) join key.
+
+        Args:
+            df (pd.DataFrame): Frame with integer `permno` and datetime `date` columns.
+
+        Returns:
+            np.ndarray: One int64 key per row; rows share a key iff they share permno and calendar day.
+    """
+
+    days = df["date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    return (df["permno"].to_numpy().astype(np.int64) << 32) | (days + 2**31)
 
 def change_crsp_exchange_codes(crsp_df: pd.DataFrame) -> None:
     """
@@ -234,20 +472,11 @@ def change_crsp_exchange_codes(crsp_df: pd.DataFrame) -> None:
                 This column should contain exchange codes as single-character strings.
 
         Returns:
-            None: The function modifies the input DataFrame in-place by adding an 'exchange' column.
+            None: The function modifies the input DataFrame in-place by adding a categorical 'exchange' column.
     """
 
-    def assign_exchange(primaryexch):
-        if primaryexch == "N":
-            return "NYSE"
-        elif primaryexch == "A":
-            return "AMEX"
-        elif primaryexch == "Q":
-            return "NASDAQ"
-        else:
-            return "Other"
-
-    crsp_df["exchange"] = crsp_df["primaryexch"].apply(assign_exchange)
+    crsp_df["exchange"] = pd.Categorical(crsp_df["primaryexch"].map(crsp_exchange_dict).fillna("Other"),
+                                         categories=crsp_exchange_categories, ordered=False)
 
 def change_crsp_industry_codes(crsp_df: pd.DataFrame) -> None:
     """
@@ -275,32 +504,83 @@ def change_crsp_industry_codes(crsp_df: pd.DataFrame) -> None:
                 This column should contain SIC codes as integers.
 
         Returns:
-            None: The function modifies the input DataFrame in-place by adding an 'industry' column.
+            None: The function modifies the input DataFrame in-place by adding a categorical 'industry' column.
     """
-    def assign_industry(siccd):
-        if 1 <= siccd <= 999:
-            return "Agriculture"
-        elif 1000 <= siccd <= 1499:
-            return "Mining"
-        elif 1500 <= siccd <= 1799:
-            return "Construction"
-        elif 2000 <= siccd <= 3999:
-            return "Manufacturing"
-        elif 4000 <= siccd <= 4899:
-            return "Transportation"
-        elif 4900 <= siccd <= 4999:
-            return "Utilities"
-        elif 5000 <= siccd <= 5199:
-            return "Wholesale"
-        elif 5200 <= siccd <= 5999:
-            return "Retail"
-        elif 6000 <= siccd <= 6799:
-            return "Finance"
-        elif 7000 <= siccd <= 8999:
-            return "Services"
-        elif 9000 <= siccd <= 9999:
-            return "Public"
-        else:
-            return "Missing"
-
-    crsp_df["industry"] = crsp_df["siccd"].apply(assign_industry)
+
+    siccd = crsp_df["siccd"].to_numpy()
+    buckets = np.searchsorted(sic_industry_edges.astype(siccd.dtype, copy=False), siccd, side="right")
+    crsp_df["industry"] = pd.Categorical.from_codes(sic_industry_codes[buckets], categories=sic_industry_categories)
+
+def build_indexes(db_con: sqlite3.Connection) -> None:
+    """
+        Creates the lookup indexes of the output database once all tables have been written.
+
+        Tables are written without any index, so bulk inserts do not pay for B-tree maintenance on every row;
+        the indexes are built in one pass each at the end of the load.
+
+        Args:
+            db_con (sqlite3.Connection): SQLite connection to the fully loaded database.
+    """
+
+    db_con.executescript(
+        "CREATE INDEX IF NOT EXISTS ix_crsp_permno_date ON crsp (permno, date); "
+        "CREATE INDEX IF NOT EXISTS ix_crsp_date ON crsp (date); "
+        "CREATE INDEX IF NOT EXISTS ix_compustat_gvkey_datadate ON compustat (gvkey, datadate);"
+    )
+
+def write_to_sqlite(df: pd.DataFrame, name: str, db_con: sqlite3.Connection, **to_sql_kwargs) -> None:
+    """
+        Writes a DataFrame to an SQLite table, replacing any existing table with the same name.
+
+        If `adbc-driver-sqlite` and `pyarrow` are installed and `db_con` points to a database file,
+        the frame is converted to an Arrow table and bulk-ingested through ADBC on a second connection
+        to the same file, so columns are bound straight from Arrow buffers instead of one Python object
+        per cell. This is several times faster for the multi-million row CRSP table. The ADBC connection
+        gets the same per-connection tuning PRAGMAs as `db_con` (journal mode, synchronous, temp store,
+        cache and mmap size). Trade-off: SQLite allows one writer at a time, so a transaction still open
+        on `db_con` is committed before the ingest, and each table is then written in its own transaction
+        rather than in the caller's single one.
+
+        Otherwise (or when `to_sql_kwargs` are given) the data goes through `DataFrame.to_sql` with
+        multi-row INSERT statements, each carrying as many rows as SQLite's bound-variable limit allows
+        (999 variables before SQLite 3.32, 32766 from 3.32 on). `method="multi"` requires pandas >= 0.24.
+
+        Args:
+            df (pd.DataFrame): The data to write.
+            name (str): Name of the SQLite table; an existing table is replaced.
+            db_con (sqlite3.Connection): SQLite database connection where the data will be stored.
+            **to_sql_kwargs: Overrides for the `DataFrame.to_sql` defaults
+                (`method="multi"`, `chunksize` derived from the column count, `index=False`).
+    """
+
+    database_file = db_con.execute("PRAGMA database_list").fetchone()[2]
+    if adbc_sqlite is not None and database_file and not to_sql_kwargs:
+        # PRAGMAs are per connection: copy the caller's bulk-load settings onto the ADBC connection
+        tuning = {pragma: db_con.execute(f"PRAGMA {pragma}").fetchone()[0]
+                  for pragma in ("journal_mode", "synchronous", "temp_store", "cache_size", "mmap_size")}
+        if db_con.in_transaction:
+            db_con.commit()  # release the write lock for the ADBC connection
+        # Store datetimes as the same 'YYYY-MM-DD HH:MM:SS' text the to_sql path writes (ADBC would write ISO
+        # text with a 'T' and microseconds), so the file does not depend on which path was taken
+        datetime_columns = df.select_dtypes(include="datetime").columns
+        df = df.assign(**{col: df[col].astype("datetime64[ns]").dt.strftime("%Y-%m-%d %H:%M:%S")
+                          for col in datetime_columns})
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        # Opened in autocommit mode, as synchronous cannot be changed inside a transaction; the ingest then
+        # runs in one explicit transaction
+        with adbc_sqlite.connect(database_file, autocommit=True) as adbc_con:
+            with adbc_con.cursor() as cursor:
+                for pragma, value in tuning.items():
+                    cursor.execute(f"PRAGMA {pragma}={value}")
+                cursor.execute("BEGIN")
+                cursor.adbc_ingest(name, arrow_table, mode="replace")
+                cursor.execute("COMMIT")
+        return
+
+    max_variables = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+    to_sql_kwargs = {"method": "multi",
+                     "chunksize": max(1, max_variables // max(1, len(df.columns))),
+                     "index": False,
+                     **to_sql_kwargs}
+
+    df.to_sql(name=name, con=db_con, if_exists="replace", **to_sql_kwargs)
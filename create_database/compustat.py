@@ -27,13 +27,14 @@ Usage:
     ```
 """
 
-import pandas as pd
 import numpy as np
 import sqlalchemy
 import sqlite3
 from datetime import datetime
 from typing import Union
-from _utils import get_annual_compustat_query, convert_to_datetime
+from _utils import (
+    get_annual_compustat_query, convert_to_datetime, read_sql_in_chunks, read_with_parquet_cache, write_to_sqlite
+)
 
 
 class Compustat:
@@ -80,7 +81,7 @@ class Compustat:
             raise ValueError("final_date cannot be earlier than start_date.")
 
         self.set_raw_data(start_date ,final_date)
-        self.add_be_and_op_columns()
+        self.keep_last_firm_year()
         self.add_inv_column()
 
         desired_columns = ['gvkey', 'datadate', 'year', 'be', 'op', 'inv']
@@ -88,44 +89,43 @@ class Compustat:
 
     def set_raw_data(self, start_date: datetime, final_date: datetime):
         """
-            Fetches annual Compustat data for the specified date range.
+            Fetches annual Compustat data, including book equity and operating profitability,
+            for the specified date range. The raw query result is cached locally as Parquet
+            (see `read_with_parquet_cache`), so repeated runs over the same window skip WRDS.
 
             Args:
                 start_date (datetime): Start date for data retrieval.
                 final_date (datetime): End date for data retrieval.
         """
-        query = get_annual_compustat_query(start_date=start_date, final_date=final_date)
-        self.df = pd.read_sql_query(sql=query, con=self.wrds, dtype={"gvkey": str}, parse_dates={"datadate"})
-
-    def add_be_and_op_columns(self):
+        query, params = get_annual_compustat_query(start_date=start_date, final_date=final_date)
+        # Arrow-backed columns keep gvkey as one UTF-8 buffer instead of a Python str object per row
+        self.df = read_with_parquet_cache(
+            "compustat",
+            lambda: read_sql_in_chunks(self.wrds, query, params, chunksize=250_000, dtype={"gvkey": "string[pyarrow]"},
+                                       dtype_backend="pyarrow", parse_dates={"datadate"}),
+            query, params
+        )
+
+        # float32 halves the footprint of the accounting items. It does round large balances: at/be are in $M with
+        # 3 decimals, which exceeds float32's ~7 significant digits for big firms. That relative error of ~1e-7 is
+        # accepted because these items are only used in ratios (BE/ME, OP, INV), never as absolute amounts.
+        self.df = self.df.astype({"at": "float32[pyarrow]", "be": "float32[pyarrow]", "op": "float32[pyarrow]"})
+
+    def keep_last_firm_year(self):
         """
-            Computes book equity (BE) and operating profitability (OP) for each firm-year observation.
-
-            - `BE` (Book Equity) is calculated based on shareholders' equity adjusted for
-              preferred stock and deferred taxes.
-            - `OP` (Operating Profitability) is computed as revenues minus cost of goods sold,
-              selling and administrative expenses, and interest expense, scaled by BE.
+            Retains only the last available observation for each firm-year.
 
-            The method retains only the last available information for each firm-year.
+            Book equity (BE) and operating profitability (OP) arrive already computed by the
+            Compustat query (see `get_annual_compustat_query`).
         """
 
-        self.df = (self.df.assign(be=lambda x: (x["seq"].combine_first(x["ceq"] + x["pstk"])
-                                                .combine_first(x["at"] - x["lt"]) +
-                                                x["txditc"].combine_first(x["txdb"] + x["itcb"]).fillna(0) -
-                                                x["pstkrv"].combine_first(x["pstkl"])
-                                                .combine_first(x["pstk"]).fillna(0)))
-                   .assign(be=lambda x: x["be"].apply(lambda y: np.nan if y <= 0 else y))
-                   .assign(
-            op=lambda x: ((x["sale"] - x["cogs"].fillna(0) - x["xsga"].fillna(0) - x["xint"].fillna(0)) / x["be"]))
-                   )
-
-        # Keep only the last available information for each firm-year group (by using the tail(1) for each group)
-        self.df = (self.df.assign(year=lambda x: pd.DatetimeIndex(x["datadate"]).year)
-                          .sort_values("datadate")
-                          .groupby(["gvkey", "year"])
-                          .tail(1)
-                          .reset_index()
-                  )
+        # Integer codes for gvkey and an int16 year keep the sort, dedup and groupby keys compact
+        self.df["gvkey"] = self.df["gvkey"].astype("category")
+        self.df["year"] = self.df["datadate"].dt.year.astype("int16")
+
+        # Keep only the last available information for each firm-year (the latest datadate after sorting)
+        self.df.sort_values(["gvkey", "year", "datadate"], inplace=True)
+        self.df.drop_duplicates(subset=["gvkey", "year"], keep="last", inplace=True, ignore_index=True)
 
     def add_inv_column(self):
         """
@@ -141,18 +141,27 @@ class Compustat:
             If `AT_{t-1}` is non-positive, the investment is set to NaN.
         """
 
-        _df = self.df.get(["gvkey", "year", "at"]).assign(year=lambda x: x["year"] + 1).rename(columns={"at": "at_lag"})
-        self.df = (self.df.merge(_df, how="left", on=["gvkey", "year"])
-                          .assign(inv=lambda x: x["at"] / x["at_lag"] - 1)
-                          .assign(inv=lambda x: np.where(x["at_lag"] <= 0, np.nan, x["inv"]))
-                  )
-
-    def write_to_sql(self, db_con: sqlite3.Connection):
+        # One row per firm-year after keep_last_firm_year, so the previous row within a firm is its lag
+        # whenever the years are consecutive; a gap in the firm's history leaves the lag missing.
+        self.df.sort_values(["gvkey", "year"], inplace=True, ignore_index=True)
+        firm = self.df.groupby("gvkey", sort=False, observed=True)
+        at_lag = firm["at"].shift(1).to_numpy(dtype="float32", na_value=np.nan)
+        consecutive = (firm["year"].shift(1) == self.df["year"] - 1).to_numpy(dtype=bool, na_value=False)
+        at = self.df["at"].to_numpy(dtype="float32", na_value=np.nan)
+
+        # Divide only where the lag is valid, into a NaN-filled buffer, and subtract 1 in place
+        inv = np.full(len(at), np.nan, dtype=np.float32)
+        np.divide(at, at_lag, out=inv, where=consecutive & (at_lag > 0))
+        np.subtract(inv, 1, out=inv)
+        self.df["inv"] = inv
+
+    def write_to_sql(self, db_con: sqlite3.Connection, **to_sql_kwargs):
         """
             Writes the processed Compustat data to an SQLite database.
 
             Args:
                 db_con (sqlite3.Connection): SQLite database connection where the data will be stored.
+                **to_sql_kwargs: Overrides for the `DataFrame.to_sql` defaults used by `write_to_sqlite`.
 
             Raises:
                 ValueError: If `df` is None or empty, indicating that there is no data to write.
@@ -161,4 +170,4 @@ class Compustat:
         if self.df is None or self.df.empty:
             raise ValueError("No data available to write to SQL. Ensure that `set_data` has been executed.")
 
-        self.df.to_sql(name="compustat", con=db_con, if_exists="replace", index=False)
+        write_to_sqlite(self.df, name="compustat", db_con=db_con, **to_sql_kwargs)
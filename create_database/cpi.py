@@ -1,13 +1,10 @@
-from _utils import convert_to_datetime
+from _utils import convert_to_datetime, read_with_parquet_cache, write_to_sqlite
 from datetime import datetime
 from typing import Union
 
-import pandas_datareader as pdr
+import pandas as pd
 import sqlite3
 
-import warnings
-warnings.filterwarnings("ignore")
-
 
 class CPI:
     """
@@ -41,7 +38,7 @@ class CPI:
 
         Notes:
         ------
-        - The CPI create_database is fetched using `pandas_datareader` from the FRED database.
+        - The CPI create_database is fetched as a CSV download from the FRED database.
         - The CPIAUCNS (All Urban Consumers CPI) key is used to access CPI create_database.
         """
 
@@ -97,24 +94,33 @@ class CPI:
 
             Notes:
             ------
-            - The create_database is retrieved using `pandas_datareader` from the FRED database.
+            - The create_database is retrieved with a single CSV download from the FRED database.
             - The CPIAUCNS key (Consumer Price Index for All Urban Consumers) is used.
+            - The raw FRED series is cached locally as Parquet for a day, keyed by the date range.
             - Normalization allows easy comparison of relative changes over time.
         """
 
-        self.df = pdr.DataReader(name="CPIAUCNS", data_source="fred", start=self.start_date, end=self.final_date)
+        fred_link = ("https://fred.stlouisfed.org/graph/fredgraph.csv?id=CPIAUCNS"
+                     f"&cosd={self.start_date:%Y-%m-%d}&coed={self.final_date:%Y-%m-%d}")
+        # The first column holds the observation dates; FRED writes missing observations as "."
+        self.df = read_with_parquet_cache(
+            "cpi",
+            lambda: pd.read_csv(fred_link, index_col=0, parse_dates=True, na_values="."),
+            fred_link, max_age=86400
+        )
         self.df.reset_index(names="date", inplace=True)
         self.df.rename(columns={"CPIAUCNS": "cpi"}, inplace=True)
 
         if normalize:
-            self.df = self.df.assign(cpi=lambda x: x["cpi"]/x["cpi"].iloc[-1])
+            self.df["cpi"] /= self.df["cpi"].iloc[-1]
 
-    def write_to_sql(self, db_con: sqlite3.Connection):
+    def write_to_sql(self, db_con: sqlite3.Connection, **to_sql_kwargs):
         """
             Writes the processed CPI data to an SQLite database.
 
             Args:
                 db_con (sqlite3.Connection): SQLite database connection where the data will be stored.
+                **to_sql_kwargs: Overrides for the `DataFrame.to_sql` defaults used by `write_to_sqlite`.
 
             Raises:
                 ValueError: If `df` is None or empty, indicating that there is no data to write.
@@ -123,4 +129,4 @@ class CPI:
         if self.df is None or self.df.empty:
             raise ValueError("No data available to write to SQL. Ensure that `set_data` has been executed.")
 
-        self.df.to_sql(name="cpi", con=db_con, if_exists="replace", index=False)
+        write_to_sqlite(self.df, name="cpi", db_con=db_con, **to_sql_kwargs)
@@ -34,11 +34,13 @@ import sqlalchemy
 import sqlite3
 
 from datetime import datetime
+from pathlib import Path
 from typing import Union
 from _utils import (
-    get_ccm_linking_table_query, change_crsp_exchange_codes,
-    change_crsp_industry_codes, get_daily_crsp_query,
-    convert_to_datetime, get_crsp_query
+    get_ccm_joined_crsp_query, change_crsp_exchange_codes,
+    change_crsp_industry_codes, fetch_daily_crsp,
+    convert_to_datetime, get_crsp_query, read_sql_in_chunks,
+    pack_permno_date_keys, write_to_sqlite
 )
 from fama_french_factors import FamaFrench
 
@@ -88,7 +90,7 @@ class CRSP:
         self.create_momentum_column()
         self.create_volatility_column(start_date, final_date)
         self.classify_for_size()
-        self.get_compustat_merge_links()
+        self.get_compustat_merge_links(start_date, final_date)
 
         desired_columns = ['permno', 'gvkey', 'exchange', 'industry', 'date', 'size_category', 'mktcap', 'ret_excess',
                            'momentum', 'volatility']
@@ -103,8 +105,10 @@ class CRSP:
                 final_date (datetime): Final date for data retrieval.
         """
 
-        query = get_crsp_query(start_date=start_date, final_date=final_date)
-        self.df = pd.read_sql_query(sql=query, con=self.wrds, dtype={"permno": int, "siccd": int}, parse_dates={"date"})
+        query, params = get_crsp_query(start_date=start_date, final_date=final_date)
+        # int32 permno (as in the CCM links and the daily returns) halves the key every groupby and merge hashes
+        self.df = read_sql_in_chunks(self.wrds, query, params, dtype={"permno": "int32", "siccd": int},
+                                     parse_dates={"date"})
         self.df['shrout'] *= 1000  # Convert shares to actual numbers
 
         change_crsp_exchange_codes(self.df)
@@ -113,8 +117,10 @@ class CRSP:
     def create_market_cap_column(self) -> None:
         """Creates Market Cap Column."""
 
-        self.df['mktcap'] = self.df['shrout']  * self.df['altprc'] / 1e6  # express it in unit of millions
-        self.df = self.df.assign(mktcap=lambda x: x["mktcap"].replace(0, np.nan))  # 0 market cap is a null value!
+        shrout = self.df['shrout'].to_numpy(dtype="float64")
+        mktcap = shrout * self.df['altprc'].to_numpy(dtype="float64") / 1e6  # express it in unit of millions
+        mktcap[mktcap == 0] = np.nan  # 0 market cap is a null value!
+        self.df['mktcap'] = mktcap
 
     def create_excess_return_column(self, start_date: datetime, final_date: datetime) -> None:
         """"Creates excess return column."""
@@ -123,55 +129,62 @@ class CRSP:
         ff.set_data(start_date=start_date, final_date=final_date)
         factors_ff3_monthly = ff.get_data()
 
-        self.df = self.df.merge(factors_ff3_monthly, how="left", on="date")
-        self.df['ret_excess'] = self.df['ret'] - self.df['rf']
+        # Only rf is needed, so look it up by date instead of merging (and copying) the whole panel;
+        # map raises if a factor date repeats, the m:1 check a merge would need validate= for.
+        risk_free = factors_ff3_monthly.set_index("date")["rf"]
+        self.df['ret_excess'] = self.df['ret'] - self.df['date'].map(risk_free)
         self.df = self.df.dropna(subset=["ret_excess", "mktcap"])  # excess returns and market caps are essential
 
     def classify_for_size(self):
         """Categorizes stocks into Large, Small, and Micro-cap based on NYSE market cap percentiles."""
 
-        nyse_stocks = self.df[self.df['exchange'] == 'NYSE']
-        large_cap_threshold = nyse_stocks['mktcap'].quantile(0.70)  # 70th percentile
-        small_cap_threshold = nyse_stocks['mktcap'].quantile(0.30)  # 30th percentile
+        # 30th and 70th NYSE percentiles from a single partition of the NYSE market caps
+        nyse_mktcap = self.df.loc[self.df['exchange'] == 'NYSE', 'mktcap'].to_numpy(dtype="float64")
+        nyse_mktcap = nyse_mktcap[~np.isnan(nyse_mktcap)]
+        if nyse_mktcap.size:
+            thresholds = np.percentile(nyse_mktcap, [30, 70])
+        else:
+            # No NYSE market caps: no stock reaches a threshold, so all are Micro (as NaN thresholds used to give)
+            thresholds = np.array([np.inf, np.inf])
 
-        def classify_size(mktcap):
-            if mktcap >= large_cap_threshold:
-                return "Large"
-            elif mktcap >= small_cap_threshold:
-                return "Small"
-            else:
-                return "Micro"
-
-        self.df['size_category'] = self.df['mktcap'].apply(classify_size)
+        # side="right" puts a stock exactly on a threshold into the bucket above it (>= comparisons)
+        codes = np.searchsorted(thresholds, self.df['mktcap'].to_numpy(), side="right")
+        self.df['size_category'] = pd.Categorical.from_codes(codes, categories=["Micro", "Small", "Large"])
 
     def create_momentum_column(self):
         """Computes momentum for each stock based on past 11 months' excess returns (excluding the last month)"""
 
         self.df = self.df.sort_values(by=['permno', 'date']).reset_index(drop=True)
 
-        def compute_momentum(group):
-            momentum_values = np.full(len(group), np.nan)
-            for i in range(12, len(group)):
-                past_returns = group['ret_excess'].iloc[i - 12:i - 1]
-                momentum_values[i] = np.prod(1 + past_returns.values) - 1
-            group['momentum'] = momentum_values
-            return group
-
-        self.df = self.df.groupby('permno', group_keys=False).apply(compute_momentum)
-
-    def get_compustat_merge_links(self):
-        """Merges CRSP data with Compustat using CCM linking table."""
+        # Row i of a stock compounds its rows i-12 .. i-2, i.e. the 11-row window starting 12 rows back.
+        # Products are taken over every 11-row window of the sorted frame at once; a window only counts
+        # when it lies inside one stock, i.e. when the row is at least the 13th of its stock.
+        # (A cumulative log1p sum would break on gross returns <= 0, which excess returns can produce.)
+        gross_returns = 1 + self.df['ret_excess'].to_numpy(dtype="float64")
+        momentum_values = np.full(len(gross_returns), np.nan)
+        if len(gross_returns) >= 11:
+            window_products = np.lib.stride_tricks.sliding_window_view(gross_returns, 11).prod(axis=1) - 1
+            rows = np.flatnonzero(self.df.groupby('permno').cumcount().to_numpy() >= 12)
+            momentum_values[rows] = window_products[rows - 12]
+        self.df['momentum'] = momentum_values
+
+    def get_compustat_merge_links(self, start_date: datetime, final_date: datetime):
+        """
+            Merges CRSP data with Compustat using CCM links resolved on the WRDS server.
 
-        ccm_linking_table_query = get_ccm_linking_table_query()
-        ccm_linking_table = pd.read_sql_query(sql=ccm_linking_table_query, con=self.wrds,
-                                              dtype={"permno": int, "gvkey": str}, parse_dates={"linkdt", "linkenddt"})
+            Args:
+                start_date (datetime): Start date for data retrieval.
+                final_date (datetime): Final date for data retrieval.
+        """
 
-        ccm_links = (self.df.merge(ccm_linking_table, how="inner", on="permno")
-                            .query("~gvkey.isnull() & (date >= linkdt) & (date <= linkenddt)")
-                            .get(["permno", "gvkey", "date"])
-                     )
+        query, params = get_ccm_joined_crsp_query(start_date=start_date, final_date=final_date)
+        ccm_links = pd.read_sql_query(sql=query, con=self.wrds, params=params, dtype={"permno": "int32", "gvkey": str},
+                                      parse_dates={"date"})
 
-        self.df = self.df.merge(ccm_links, how="left", on=["permno", "date"])
+        # Join on one packed int64 (permno, date) key instead of a two-column key
+        self.df = (self.df.merge(ccm_links[["gvkey"]], how="left",
+                                 left_on=pack_permno_date_keys(self.df), right_on=pack_permno_date_keys(ccm_links))
+                          .drop(columns="key_0"))
 
     def create_volatility_column(self, start_date: datetime, final_date: datetime):
         """
@@ -189,63 +202,35 @@ class CRSP:
 
             permnos = pd.read_sql(sql="SELECT DISTINCT permno FROM crsp.stksecurityinfohist", con=self.wrds,
                                   dtype={"permno": int})
-            permnos = list(permnos["permno"].astype(str))
-            batch_size = 500
-            batches = np.ceil(len(permnos) / batch_size).astype(int)
-
-            df_list = []
-            for j in range(1, batches + 1):
-                permno_batch = permnos[((j - 1) * batch_size):(min(j * batch_size, len(permnos)))]
-                permno_batch_formatted = (", ".join(f"'{permno}'" for permno in permno_batch))
-                permno_string = f"({permno_batch_formatted})"
-                query = get_daily_crsp_query(start_date, final_date, permno_string)
+            permnos = permnos["permno"].tolist()
 
-                crsp_daily_sub = pd.read_sql_query(sql=query, con=self.wrds, dtype={"permno": int}, parse_dates={"date"})
-                crsp_daily_sub = crsp_daily_sub.dropna()
+            risk_free = factors_ff3_daily.set_index("date")["rf"]
+            return fetch_daily_crsp(self.wrds, start_date, final_date, permnos, risk_free)
 
-                if not crsp_daily_sub.empty:
-                    crsp_daily_sub = crsp_daily_sub.merge(factors_ff3_daily[["date", "rf"]], on="date", how="left")
-                    crsp_daily_sub = crsp_daily_sub.assign(ret_excess=lambda x: ((x["ret"] - x["rf"]).clip(lower=-1)))
-                    crsp_daily_sub = crsp_daily_sub.get(["permno", "date", "ret_excess"])
-                    df_list.append(crsp_daily_sub)
+        df_daily = get_daily_crsp_data()  # already sorted by permno and date
 
-                print(f"Batch {j} out of {batches} done ({(j / batches) * 100:.2f}%)")
+        # Rolling std of the previous 60 daily excess returns (at least 20), scaled by sqrt of the observation count.
+        # Shift and rolling run per permno through groupby, with no Python-level function call per stock.
+        lagged_returns = df_daily.groupby("permno")["ret_excess"].shift(1)
+        rolling_window = lagged_returns.groupby(df_daily["permno"]).rolling(window=60, min_periods=20)
+        df_daily["volatility"] = (rolling_window.std() * np.sqrt(rolling_window.count())).droplevel(0)
 
-            crsp_daily_final = pd.concat(df_list, ignore_index=True)
+        # merge backward: each monthly row takes the volatility of the last daily row of the same permno on or
+        # before its date. The packed (permno, day) keys sort like the daily frame, so a binary search per
+        # monthly row replaces re-sorting both panels by date for merge_asof.
+        daily_keys = pack_permno_date_keys(df_daily)
+        monthly_keys = pack_permno_date_keys(self.df)
+        positions = np.searchsorted(daily_keys, monthly_keys, side="right") - 1
+        matched = (positions >= 0) & ((daily_keys[np.maximum(positions, 0)] >> 32) == (monthly_keys >> 32))
+        self.df['volatility'] = np.where(matched, df_daily['volatility'].to_numpy()[np.maximum(positions, 0)], np.nan)
 
-            return crsp_daily_final
-
-        df_daily = get_daily_crsp_data()
-
-        self.df = self.df.sort_values(by=['permno', 'date']).reset_index(drop=True)
-        df_daily = df_daily.sort_values(by=['permno', 'date']).reset_index(drop=True)
-
-        def compute_vol(sub_df):
-            #sub_df["volatility"] = sub_df["ret_excess"].shift(1).rolling(window=60, min_periods=20).std()
-            sub_df["volatility"] = (
-                    sub_df["ret_excess"].shift(1)
-                    .rolling(window=60, min_periods=20)
-                    .std() * np.sqrt(sub_df["ret_excess"].shift(1).rolling(window=60, min_periods=20).count())
-            )
-            return sub_df
-
-        df_daily = df_daily.groupby("permno", group_keys=False).apply(compute_vol)
-
-        # merge backward
-        self.df['date'] = pd.to_datetime(self.df['date'])
-        df_daily['date'] = pd.to_datetime(df_daily['date'])
-        self.df = self.df.sort_values(['date', 'permno'])
-        df_daily = df_daily.sort_values(['date', 'permno'])
-        df_daily = df_daily[['permno', 'date', 'volatility']]
-        self.df = pd.merge_asof(self.df, df_daily, on='date', by='permno', direction='backward')
-        self.df = self.df.sort_values(['permno', 'date'])
-
-    def write_to_sql(self, db_con: sqlite3.Connection):
+    def write_to_sql(self, db_con: sqlite3.Connection, **to_sql_kwargs):
         """
             Writes the processed CRSP data to an SQLite database.
 
             Args:
                 db_con (sqlite3.Connection): SQLite database connection where the data will be stored.
+                **to_sql_kwargs: Overrides for the `DataFrame.to_sql` defaults used by `write_to_sqlite`.
 
             Raises:
                 ValueError: If `df` is None or empty, indicating that there is no data to write.
@@ -254,4 +239,23 @@ class CRSP:
         if self.df is None or self.df.empty:
             raise ValueError("No data available to write to SQL. Ensure that `set_data` has been executed.")
 
-        self.df.to_sql(name="crsp", con=db_con, if_exists="replace", index=False)
+        write_to_sqlite(self.df, name="crsp", db_con=db_con, **to_sql_kwargs)
+
+    def write_to_parquet(self, path: Union[str, Path]):
+        """
+            Writes the processed CRSP data to a zstd-compressed Parquet file.
+
+            Columnar Parquet is much faster to write and to read back than the SQLite table for analyses that
+            load whole columns of the panel; row groups of 200k rows keep partial reads cheap.
+
+            Args:
+                path (Union[str, Path]): Destination file; an existing file is overwritten.
+
+            Raises:
+                ValueError: If `df` is None or empty, indicating that there is no data to write.
+        """
+
+        if self.df is None or self.df.empty:
+            raise ValueError("No data available to write to Parquet. Ensure that `set_data` has been executed.")
+
+        self.df.to_parquet(path, compression="zstd", row_group_size=200_000, index=False)
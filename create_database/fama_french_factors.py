@@ -1,5 +1,6 @@
 from _params import famafrench_identifiers_dict
-from _utils import convert_to_datetime
+from _utils import convert_to_datetime, read_with_parquet_cache, write_to_sqlite
+from functools import lru_cache
 from datetime import datetime
 from typing import Union
 
@@ -10,6 +11,22 @@ import warnings
 warnings.filterwarnings("ignore")
 
 
+@lru_cache(maxsize=32)
+def _fetch_famafrench(name: str, start_date: datetime, final_date: datetime) -> pd.DataFrame:
+    """
+        Downloads one Fama-French table, memoized per process and cached on disk for a day.
+
+        A full database build asks for the monthly three-factor table twice (for its own table and for CRSP
+        excess returns); both requests are served by a single download. Callers must not modify the result.
+    """
+
+    return read_with_parquet_cache(
+        "famafrench",
+        lambda: pdr.DataReader(name=name, data_source="famafrench", start=start_date, end=final_date)[0],
+        name, start_date, final_date, max_age=86400
+    )
+
+
 class FamaFrench:
     """
         # ------------------------------
@@ -129,11 +146,8 @@ class FamaFrench:
         if final_date < start_date:
             raise ValueError("final_date cannot be earlier than start_date.")
 
-        raw_data = pdr.DataReader(
-            name=famafrench_identifiers_dict[self.ff_version, self.data_freq],
-            data_source="famafrench",
-            start=start_date,
-            end=final_date)[0]
+        raw_data = _fetch_famafrench(famafrench_identifiers_dict[self.ff_version, self.data_freq],
+                                     start_date, final_date)
 
         self.df = (raw_data
                    .divide(100)
@@ -150,12 +164,13 @@ class FamaFrench:
             raise ValueError("Fama-French data not available.")
         return self.df
 
-    def write_to_sql(self, db_con: sqlite3.Connection):
+    def write_to_sql(self, db_con: sqlite3.Connection, **to_sql_kwargs):
         """
             Writes the processed Fama-French data to an SQLite database.
 
             Args:
                 db_con (sqlite3.Connection): SQLite database connection where the data will be stored.
+                **to_sql_kwargs: Overrides for the `DataFrame.to_sql` defaults used by `write_to_sqlite`.
 
             Raises:
                 ValueError: If `df` is None or empty, indicating that there is no data to write.
@@ -165,4 +180,4 @@ class FamaFrench:
             raise ValueError("No data available to write to SQL. Ensure that `set_data` has been executed.")
 
         format_name = f"fama_french_{self.ff_version}_{self.data_freq}"
-        self.df.to_sql(name=format_name, con=db_con, if_exists="replace", index=False)
+        write_to_sqlite(self.df, name=format_name, db_con=db_con, **to_sql_kwargs)
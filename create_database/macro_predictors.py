@@ -1,11 +1,10 @@
-from _utils import convert_to_datetime
+from _utils import convert_to_datetime, read_with_parquet_cache, write_to_sqlite
 from datetime import datetime
 from typing import Union
 
 import pandas as pd
 import numpy as np
 import sqlite3
-import ssl
 
 
 class MacroPredictors:
@@ -43,40 +42,46 @@ class MacroPredictors:
         self.df = None
 
     def set_data(self):
-        """read and sets the data"""
+        """read and sets the data (the raw sheet is cached locally as Parquet for a day)"""
         sheet_id = "1bM7vCWd3WOt95Sf9qjLPZjoiafgF_8EG"
         sheet_name = "macro_predictors.xlsx"
         macro_predictors_link = f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}"
 
-        ssl._create_default_https_context = ssl._create_unverified_context
-
-        self.df = (
-            pd.read_csv(macro_predictors_link, thousands=",")
-            .assign(
-                date=lambda x: pd.to_datetime(x["yyyymm"], format="%Y%m"),
-                dp=lambda x: np.log(x["D12"]) - np.log(x["Index"]),
-                dy=lambda x: np.log(x["D12"]) - np.log(x["Index"].shift(1)),
-                ep=lambda x: np.log(x["E12"]) - np.log(x["Index"]),
-                de=lambda x: np.log(x["D12"]) - np.log(x["E12"]),
-                tms=lambda x: x["lty"] - x["tbl"],
-                dfy=lambda x: x["BAA"] - x["AAA"]
-            )
-            .rename(columns={"b/m": "bm"})
-            .get(["date", "dp", "dy", "ep", "de", "svar", "bm",
-                  "ntis", "tbl", "lty", "ltr", "tms", "dfy", "infl"])
-            .query("date >= @self.start_date and date <= @self.final_date")
-            .dropna()
-        )
-
-        ssl._create_default_https_context = ssl.create_default_context
-
-
-    def write_to_sql(self, db_con: sqlite3.Connection):
+        raw_data = read_with_parquet_cache("macro_predictors",
+                                           lambda: pd.read_csv(macro_predictors_link, thousands=","),
+                                           macro_predictors_link, max_age=86400)
+
+        # Logs are taken once on NumPy arrays and the output frame is built in one go
+        log_index = np.log(raw_data["Index"].to_numpy(dtype="float64"))
+        log_d12 = np.log(raw_data["D12"].to_numpy(dtype="float64"))
+        log_e12 = np.log(raw_data["E12"].to_numpy(dtype="float64"))
+        macro_predictors = pd.DataFrame({
+            "date": pd.to_datetime(raw_data["yyyymm"], format="%Y%m"),
+            "dp": log_d12 - log_index,
+            "dy": log_d12 - np.r_[np.nan, log_index[:-1]],
+            "ep": log_e12 - log_index,
+            "de": log_d12 - log_e12,
+            "svar": raw_data["svar"],
+            "bm": raw_data["b/m"],
+            "ntis": raw_data["ntis"],
+            "tbl": raw_data["tbl"],
+            "lty": raw_data["lty"],
+            "ltr": raw_data["ltr"],
+            "tms": raw_data["lty"] - raw_data["tbl"],
+            "dfy": raw_data["BAA"] - raw_data["AAA"],
+            "infl": raw_data["infl"],
+        })
+
+        in_window = macro_predictors["date"].between(self.start_date, self.final_date)
+        self.df = macro_predictors[in_window & macro_predictors.notna().all(axis=1)]
+
+    def write_to_sql(self, db_con: sqlite3.Connection, **to_sql_kwargs):
         """
             Writes the processed Macro Predictors data to an SQLite database.
 
             Args:
                 db_con (sqlite3.Connection): SQLite database connection where the data will be stored.
+                **to_sql_kwargs: Overrides for the `DataFrame.to_sql` defaults used by `write_to_sqlite`.
 
             Raises:
                 ValueError: If `df` is None or empty, indicating that there is no data to write.
@@ -85,4 +90,4 @@ class MacroPredictors:
         if self.df is None or self.df.empty:
             raise ValueError("No data available to write to SQL. Ensure that `set_data` has been executed.")
 
-        self.df.to_sql(name="macro_predictors", con=db_con, if_exists="replace", index=False)
+        write_to_sqlite(self.df, name="macro_predictors", db_con=db_con, **to_sql_kwargs)
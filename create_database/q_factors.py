@@ -1,10 +1,12 @@
-from _utils import convert_to_datetime
+from _utils import convert_to_datetime, read_with_parquet_cache, write_to_sqlite
 from datetime import datetime
 from typing import Union
 
 import pandas as pd
+import urllib.request
 import sqlite3
 import ssl
+import io
 
 
 class QFactors:
@@ -43,23 +45,30 @@ class QFactors:
 
     def set_data(self):
 
-        ssl._create_default_https_context = ssl._create_unverified_context
         _link = "https://global-q.org/uploads/1/2/2/6/122679606/q5_factors_monthly_2023.csv"
-        self.df = pd.read_csv(_link)
+
+        def download() -> pd.DataFrame:
+            # Certificate verification is relaxed through a context for this request only; the process-wide
+            # default is left alone, since the other readers download concurrently from worker threads
+            with urllib.request.urlopen(_link, context=ssl._create_unverified_context()) as response:
+                payload = response.read()
+            return pd.read_csv(io.BytesIO(payload), engine="pyarrow")  # multi-threaded Arrow CSV parser
+
+        # The 2023 vintage file never changes, so the parsed CSV is cached locally as Parquet for good
+        self.df = read_with_parquet_cache("q_factors", download, _link)
         self.df = self.df.assign(date=lambda x: (pd.to_datetime(x["year"].astype(str) + "-" + x["month"].astype(str) + "-01")))
         self.df = self.df.drop(columns=["R_F", "R_MKT", "year"])
         self.df = self.df.rename(columns=lambda x: x.replace("R_", "").lower())
         self.df = self.df.query(f"date >= '{self.start_date}' and date <= '{self.final_date}'")
         self.df = self.df.assign(**{col: lambda x: x[col] / 100 for col in ["me", "ia", "roe", "eg"]})
 
-        ssl._create_default_https_context = ssl.create_default_context
-
-    def write_to_sql(self, db_con: sqlite3.Connection):
+    def write_to_sql(self, db_con: sqlite3.Connection, **to_sql_kwargs):
         """
             Writes the processed Q-factors data to an SQLite database.
 
             Args:
                 db_con (sqlite3.Connection): SQLite database connection where the data will be stored.
+                **to_sql_kwargs: Overrides for the `DataFrame.to_sql` defaults used by `write_to_sqlite`.
 
             Raises:
                 ValueError: If `df` is None or empty, indicating that there is no data to write.
@@ -68,4 +77,4 @@ class QFactors:
         if self.df is None or self.df.empty:
             raise ValueError("No data available to write to SQL. Ensure that `set_data` has been executed.")
 
-        self.df.to_sql(name="q_factors", con=db_con, if_exists="replace", index=False)
\ No newline at end of file
+        write_to_sqlite(self.df, name="q_factors", db_con=db_con, **to_sql_kwargs)
\ No newline at end of file
@@ -0,0 +1,54 @@
+from pathlib import Path
+import pandas as pd
+import sqlite3
+import os
+
+import warnings
+warnings.filterwarnings('ignore')
+
+# Specify time window
+start_date = '1963-01-01'
+final_date = '2023-12-31'
+
+# Database Connection
+db = sqlite3.connect(database=f"{start_date}__{final_date}.sqlite")
+
+# Compustat + CRSP Datasets
+# (only the columns written to the parquet file, not every stored column, read as int32/float32)
+compustat_data = pd.read_sql_query(sql="SELECT gvkey, datadate, be, op, inv FROM compustat", con=db,
+                                   dtype={"be": "float32", "op": "float32", "inv": "float32"},
+                                   parse_dates={"datadate"})
+crsp_data = pd.read_sql_query(sql="SELECT permno, gvkey, date, exchange, industry, mktcap, volatility, ret_excess "
+                                  "FROM crsp", con=db,
+                              dtype={"permno": "int32", "mktcap": "float32", "volatility": "float32",
+                                     "ret_excess": "float32"},
+                              parse_dates={"date"})
+
+# Merge them (the fiscal year-end market cap is the only CRSP field the characteristics need)
+characteristics = (compustat_data
+                           .assign(date=lambda x: x["datadate"].dt.to_period("M").dt.to_timestamp())
+                           .merge(crsp_data[["gvkey", "date", "mktcap"]], how="left", on=["gvkey", "date"], )
+                           .assign(
+                                    bm=lambda x: x["be"] / x["mktcap"],
+                                    sorting_date=lambda x: x["date"] + pd.DateOffset(months=6)
+                                  ))
+
+characteristics = characteristics.get(["gvkey", "bm", "sorting_date", "op", "inv"])
+
+df = (crsp_data.merge(characteristics, how="left", left_on=["gvkey", "date"], right_on=["gvkey", "sorting_date"])
+                              .sort_values(["permno", "date"], ignore_index=True))
+
+# Carry each stock's last characteristics forward
+ffill_columns = ["bm", "op", "inv"]
+df[ffill_columns] = df.groupby("permno", sort=False)[ffill_columns].ffill()
+
+df = df.get(["permno", "date", "exchange", "industry", "mktcap", "bm", "op", "inv", "volatility", "ret_excess"]).dropna()
+
+# Columnar, zstd-compressed Parquet: small and fast to write, and it keeps the dtypes
+df.to_parquet(f'{start_date}__{final_date}.parquet', compression='zstd', index=False)
+
+ff3_factors = pd.read_sql_query(sql="SELECT * FROM fama_french_3_M", con=db, parse_dates={"date"})
+ff3_factors.to_parquet('ff3_factors.parquet', compression='zstd', index=False)
+
+ff5_factors = pd.read_sql_query(sql="SELECT * FROM fama_french_5_M", con=db, parse_dates={"date"})
+ff5_factors.to_parquet('ff5_factors.parquet', compression='zstd', index=False)
\ No newline at end of file
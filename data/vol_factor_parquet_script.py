@@ -10,4 +10,4 @@ final_date = '2023-12-31'
 
 f = VolFactor(start_date, final_date)
 f.create_factor()
-f.to_csv()
\ No newline at end of file
+f.to_parquet()
\ No newline at end of file
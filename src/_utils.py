@@ -1,21 +1,29 @@
 import pandas as pd
-import numpy as np
+import os
 
 def compute_nyse_breakpoints(_df):
-    breakpoints = _df[_df['exchange'] == 'NYSE'].groupby('date').apply(
-        lambda x: pd.Series({
-            'size_median': x['mktcap'].median(),
-            'vol_30': x['volatility'].quantile(0.3),
-            'vol_70': x['volatility'].quantile(0.7)
-        })
-    )
+    # Grouped median and quantiles over all dates at once, instead of building a Series per date
+    nyse = _df.loc[_df['exchange'] == 'NYSE', ['date', 'mktcap', 'volatility']]
+    # (one scalar quantile per column, so a frame without NYSE rows still gives the three empty columns)
+    volatility = nyse.groupby('date')['volatility']
+    breakpoints = pd.DataFrame({'size_median': nyse.groupby('date')['mktcap'].median(),
+                                'vol_30': volatility.quantile(0.3),
+                                'vol_70': volatility.quantile(0.7)})
     return breakpoints.reset_index()
 
 
 def value_weighted_returns(_df):
-    portfolio_returns = _df.groupby(['date', 'portfolio']).apply(
-        lambda x: np.average(x['ret_excess'], weights=x['mktcap'])
-    ).reset_index()
+    # sum(ret * mktcap) / sum(mktcap) per date and portfolio, as two grouped column sums instead of a lambda per group
+    weighted = _df[['date', 'portfolio', 'mktcap']].assign(ret_mktcap=_df['ret_excess'] * _df['mktcap'])
+    sums = weighted.groupby(['date', 'portfolio'], observed=True)[['ret_mktcap', 'mktcap']].sum()
 
-    portfolio_returns.columns = ['date', 'portfolio', 'vw_return']
+    portfolio_returns = (sums['ret_mktcap'] / sums['mktcap']).rename('vw_return').reset_index()
     return portfolio_returns
+
+
+def write_atomically(path, write):
+    # write(temp_path) writes the file next to its destination, which then replaces `path` in one rename,
+    # so readers never see a half-written file
+    temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    write(temp_path)
+    temp_path.replace(path)
@@ -1,15 +1,110 @@
+from _utils import write_atomically
+from functools import lru_cache
 from pathlib import Path
 
-import statsmodels.formula.api as smf
 import pandas as pd
 import numpy as np
+import hashlib
+import inspect
 import sqlite3
-import os
 
 import warnings
 warnings.filterwarnings('ignore')
 
 
+def _read_table(database_name: str, table: str, date_column: str, columns: list, dtype: dict) -> pd.DataFrame:
+    """Reads `columns` of a table of the sqlite database through a zstd Parquet copy of the whole table, kept
+    next to the database as `<database>_<table>.parquet`. The copy is written on the first read (and again
+    whenever the database file is newer), so later runs skip sqlite's row-by-row Python conversion."""
+
+    database_path = Path(database_name)
+    parquet_path = database_path.with_name(f"{database_path.stem}_{table}.parquet")
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= database_path.stat().st_mtime:
+        return pd.read_parquet(parquet_path, columns=columns).astype(dtype)
+
+    database_connection = sqlite3.connect(database=database_name)
+    df = pd.read_sql_query(sql=f"SELECT * FROM {table}", con=database_connection, parse_dates={date_column})
+    database_connection.close()
+
+    write_atomically(parquet_path, lambda path: df.to_parquet(path, compression="zstd", index=False))
+    return df[columns].astype(dtype)
+
+
+@lru_cache(maxsize=4)
+def _load_regression_panel(database_name: str, compustat_month_lag: int) -> pd.DataFrame:
+    """Returns the full (unfiltered) regression panel of a database and lag, built once per process; every
+    FamaMacbeth instance of the same window then shares it, so e.g. the per-size-category runs read and merge
+    the tables only once. The panel is also kept next to the database as
+    `<database>_panel_lag<lag>_<code hash>.feather`, so later runs load it instead of rebuilding it. The hash of
+    `_build_regression_panel`'s source is part of the name, so editing the panel construction builds a new file;
+    it is also rebuilt whenever the database file is newer, and panels built by older code are deleted."""
+
+    code_hash = hashlib.sha1(inspect.getsource(_build_regression_panel).encode()).hexdigest()[:12]
+    database_path = Path(database_name)
+    panel_path = database_path.with_name(f"{database_path.stem}_panel_lag{compustat_month_lag}_{code_hash}.feather")
+    if panel_path.exists() and panel_path.stat().st_mtime >= database_path.stat().st_mtime:
+        return pd.read_feather(panel_path)
+
+    panel = _build_regression_panel(database_name, compustat_month_lag)
+    write_atomically(panel_path, panel.to_feather)
+    for stale_path in panel_path.parent.glob(f"{database_path.stem}_panel_lag{compustat_month_lag}_*.feather"):
+        if stale_path != panel_path:
+            stale_path.unlink(missing_ok=True)
+    return panel
+
+
+def _build_regression_panel(database_name: str, compustat_month_lag: int) -> pd.DataFrame:
+    """Reads CRSP and Compustat, builds the characteristics and next month's return, and drops incomplete rows."""
+
+    # Read only the columns the regressions use, as int32/float32 (the float32 rounding trade-off is explained
+    # in create_database/compustat.py; here too only ratios, logs and returns enter the regressions).
+    # The regressions themselves still run in float64, see run().
+    compustat_data = _read_table(database_name, "compustat", "datadate",
+                                 columns=["gvkey", "datadate", "be", "op", "inv"],
+                                 dtype={"be": "float32", "op": "float32", "inv": "float32"})
+
+    crsp_data = _read_table(database_name, "crsp", "date",
+                            columns=["permno", "gvkey", "date", "size_category", "mktcap", "ret_excess", "momentum",
+                                     "volatility"],
+                            dtype={"permno": "int32", "mktcap": "float32", "ret_excess": "float32",
+                                   "momentum": "float32", "volatility": "float32"})
+
+    # Next month's excess return of each stock, read from the following row of the same permno when that row
+    # is the next calendar month (dates are month starts). A (permno, date) repeats when overlapping CCM links
+    # give it two gvkeys, so the lead is computed on one row per (permno, date) and merged back onto all of them.
+    crsp_data = crsp_data.sort_values(["permno", "date"], ignore_index=True)
+    stock_months = crsp_data.drop_duplicates(["permno", "date"])[["permno", "date", "ret_excess"]]
+    next_row = stock_months.groupby("permno", sort=False)[["date", "ret_excess"]].shift(-1)
+    is_next_month = next_row["date"] == stock_months["date"] + pd.DateOffset(months=1)
+    leads = stock_months[["permno", "date"]].assign(ret_excess_lead=next_row["ret_excess"].where(is_next_month))
+    crsp_data = crsp_data.merge(leads, how="left", on=["permno", "date"], validate="many_to_one")
+
+    # The fiscal year-end market cap is the only CRSP field the characteristics need
+    characteristics = (compustat_data
+                       .assign(date=lambda x: x["datadate"].dt.to_period("M").dt.to_timestamp())
+                       .merge(crsp_data[["gvkey", "date", "mktcap"]], how="left", on=["gvkey", "date"], )
+                       .assign(
+                                log_bm=lambda x: np.log(x["be"] / x["mktcap"]).where(x["be"] > 0, np.nan),
+                                log_mktcap=lambda x: np.log(x["mktcap"]),
+                                sorting_date=lambda x: x["date"] + pd.DateOffset(months=compustat_month_lag)
+                              ))
+    characteristics = characteristics.get(["gvkey", "log_bm", "log_mktcap", "sorting_date", "op", "inv"])
+
+    # A left merge keeps the (permno, date) order of crsp_data
+    data_fama_macbeth = crsp_data.merge(characteristics, how="left", left_on=["gvkey", "date"], right_on=["gvkey", "sorting_date"])
+
+    # Carry each stock's last characteristics forward, one grouped ffill over all columns at once
+    ffill_columns = ["log_bm", "op", "inv", "log_mktcap"]
+    data_fama_macbeth[ffill_columns] = data_fama_macbeth.groupby("permno", sort=False)[ffill_columns].ffill()
+
+    data_fama_macbeth = (data_fama_macbeth
+                         .get(["permno", "date", "size_category", "ret_excess_lead", "log_mktcap", "mktcap", "log_bm", "op", "inv", "ret_excess", "momentum", "volatility"])
+                         .dropna()
+                         .reset_index(drop=True))  # feather stores only a default index
+
+    return data_fama_macbeth
+
+
 class FamaMacbeth:
 
     def __init__(self,
@@ -23,7 +118,9 @@ class FamaMacbeth:
         parent_path = current_path.parent.parent
         data_folder = parent_path / "data"
         database_name = data_folder / f"{start_date}__{final_date}.sqlite"
-        self.database_connection = sqlite3.connect(database=database_name)
+        if not database_name.exists():
+            raise FileNotFoundError(f'{database_name} not found; first build it with create_database/_main.py')
+        self.database_name = database_name
         self.compustat_month_lag = compustat_month_lag
         self.data = None
         self.drop_tail_percentile = drop_tail_percentile
@@ -33,40 +130,8 @@ class FamaMacbeth:
 
     def prepare_data(self):
 
-        compustat_data = pd.read_sql_query(sql="SELECT * FROM compustat",
-                                           con=self.database_connection,
-                                           parse_dates={"datadate"})
-
-        crsp_data = pd.read_sql_query(sql="SELECT * FROM crsp", con=self.database_connection, parse_dates={"date"})
-
-        characteristics = (compustat_data
-                           .assign(date=lambda x: x["datadate"].dt.to_period("M").dt.to_timestamp())
-                           .merge(crsp_data, how="left", on=["gvkey", "date"], )
-                           .assign(
-                                    log_bm=lambda x: np.log(x["be"] / x["mktcap"]).where(x["be"] > 0, np.nan),
-                                    log_mktcap=lambda x: np.log(x["mktcap"]),
-                                    sorting_date=lambda x: x["date"] + pd.DateOffset(months=self.compustat_month_lag)
-                                  ))
-        characteristics = characteristics.get(["gvkey", "log_bm", "log_mktcap", "sorting_date", "op", "inv"])
-
-        data_fama_macbeth = (crsp_data.merge(characteristics, how="left", left_on=["gvkey", "date"], right_on=["gvkey", "sorting_date"])
-                                      .sort_values(["date", "permno"])
-                                      .groupby("permno")
-                                      .apply(lambda x: x.assign(log_bm=x["log_bm"].fillna(method="ffill"),
-                                                                op=x["op"].fillna(method="ffill"),
-                                                                inv=x["inv"].fillna(method="ffill"),
-                                                                log_mktcap=x["log_mktcap"].fillna(method="ffill"))))
-        data_fama_macbeth = data_fama_macbeth.reset_index(drop=True)
-
-        data_fama_macbeth_lagged = (data_fama_macbeth
-                                    .assign(date=lambda x: x["date"] - pd.DateOffset(months=1))
-                                    .get(["permno", "date", "ret_excess"])
-                                    .rename(columns={"ret_excess": "ret_excess_lead"})
-                                    )
-
-        data_fama_macbeth = (data_fama_macbeth.merge(data_fama_macbeth_lagged, how="left", on=["permno", "date"])
-                                              .get(["permno", "date", "size_category", "ret_excess_lead", "log_mktcap", "mktcap", "log_bm", "op", "inv", "ret_excess", "momentum", "volatility"])
-                                              .dropna())
+        # The cached panel is shared, so work on a copy of it
+        data_fama_macbeth = _load_regression_panel(str(self.database_name), self.compustat_month_lag).copy()
 
         if self.drop_tail_percentile is not None:
             date_counts = data_fama_macbeth['date'].value_counts()
@@ -83,34 +148,51 @@ class FamaMacbeth:
 
         # cross-sectional regression
         """"""
-        if is_ols:
-            formula_string = "ret_excess_lead ~ log_mktcap + log_bm + op + inv + ret_excess + momentum  + volatility"
-            risk_premiums = (self.data.groupby("date").apply(lambda x: smf.ols(formula=formula_string, data=x).fit().params)
-                               .reset_index())
-        else:  # wls
-            formula_string = "ret_excess_lead ~ log_mktcap + log_bm + op + inv + ret_excess + momentum + volatility"
-            risk_premiums = (self.data.groupby("date")
-                             .apply(lambda x: smf.wls(formula=formula_string, data=x, weights=x["mktcap"]).fit().params)
-                             .reset_index())
-
-        # time series aggregation
-        price_of_risk = (risk_premiums
-                         .melt(id_vars="date", var_name="factor", value_name="estimate")
-                         .groupby("factor")["estimate"]
-                         .apply(lambda x: pd.Series({"risk_premium": 100 * x.mean()}))
-                         .reset_index()
-                         .pivot(index="factor", columns="level_1", values="estimate")
-                         .reset_index())
+        # ret_excess_lead ~ log_mktcap + log_bm + op + inv + ret_excess + momentum + volatility, one fit per date.
+        # The design matrix is built once, sorted by date; WLS scales its rows by sqrt(mktcap). It is float64 even
+        # though the inputs are float32: the normal equations square its condition number.
+        regressors = ["log_mktcap", "log_bm", "op", "inv", "ret_excess", "momentum", "volatility"]
+        data = self.data.sort_values("date", kind="stable")
+        x = np.column_stack([np.ones(len(data))] + [data[col].to_numpy(dtype="float64") for col in regressors])
+        y = data["ret_excess_lead"].to_numpy(dtype="float64")
+        if not is_ols:  # wls
+            sqrt_weights = np.sqrt(data["mktcap"].to_numpy(dtype="float64"))
+            x = x * sqrt_weights[:, None]
+            y = y * sqrt_weights
+
+        dates = data["date"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+
+        # Normal equations of every month at once: reduceat sums the cross products over each date's rows,
+        # one regressor column at a time to keep memory at a single n x k buffer, and one stacked pinv
+        # solves all the k x k systems (the minimum-norm solution, as statsmodels' pinv fit).
+        k = x.shape[1]
+        xtx = np.empty((len(starts), k, k))
+        for i in range(k):
+            xtx[:, i, :] = np.add.reduceat(x * x[:, [i]], starts, axis=0)
+        xty = np.add.reduceat(x * y[:, None], starts, axis=0)
+        estimates = (np.linalg.pinv(xtx, hermitian=True) @ xty[:, :, None])[:, :, 0]
+        risk_premiums = pd.DataFrame(estimates, columns=["Intercept"] + regressors)
+        risk_premiums.insert(0, "date", dates[starts])
+
+        # time series aggregation: average monthly premium of each factor, in percent
+        factors = sorted(risk_premiums.columns.drop("date"))
+        estimates = risk_premiums[factors].to_numpy()
+        n_months = len(estimates)
+        mean_estimates = estimates.mean(axis=0)
 
         # Newey and West (1987) Standard Errors
-        price_of_risk_newey_west = (risk_premiums
-                                    .melt(id_vars="date", var_name="factor", value_name="estimate")
-                                    .groupby("factor")
-                                    .apply(lambda x: (x["estimate"].mean() / smf.ols("estimate ~ 1", x).fit(cov_type="HAC", cov_kwds={"maxlags": 6}).bse))
-                                    .reset_index()
-                                    .rename(columns={"Intercept": "t_stat_newey_west"})
-                                    )
-
-        price_of_risk = price_of_risk.merge(price_of_risk_newey_west, on="factor").round(3)
+        # Bartlett-weighted autocovariances up to 6 lags of every factor's series at once; the same HAC variance
+        # (no small-sample correction) as statsmodels gives an intercept-only OLS fit with maxlags=6
+        max_lags = 6
+        deviations = estimates - mean_estimates
+        long_run_variance = (deviations * deviations).sum(axis=0)
+        for lag in range(1, max_lags + 1):
+            long_run_variance += 2 * (1 - lag / (max_lags + 1)) * (deviations[lag:] * deviations[:-lag]).sum(axis=0)
+        standard_errors = np.sqrt(long_run_variance) / n_months
+
+        price_of_risk = pd.DataFrame({"factor": factors,
+                                      "risk_premium": 100 * mean_estimates,
+                                      "t_stat_newey_west": mean_estimates / standard_errors}).round(3)
 
         return price_of_risk
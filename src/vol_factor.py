@@ -18,7 +18,7 @@ class VolFactor:
 
     >>> f = VolFactor(start_date, final_date)
     >>> f.create_factor()
-    >>> f.to_csv()
+    >>> f.to_parquet()
     """
 
     def __init__(self, start_date: str, final_date: str):
@@ -29,43 +29,50 @@ class VolFactor:
 
     def create_factor(self):
 
-        # make sure that you run the 'sql_to_csv.py' script under ./data folder
+        # make sure that you run the 'sql_to_parquet_script.py' script under ./data folder
 
         current_path = Path(os.getcwd()).resolve()
         parent_path = current_path.parent
         data_folder = parent_path / "data"
-        data_name = data_folder / f"{self.start_date}__{self.final_date}.csv"
-        monthly_data = pd.read_csv(data_name)
+        data_name = data_folder / f"{self.start_date}__{self.final_date}.parquet"
+        monthly_data = pd.read_parquet(data_name, columns=['date', 'exchange', 'mktcap', 'volatility', 'ret_excess'])
 
+        # Each row finds its date in the sorted breakpoint dates by binary search instead of merging the breakpoints
+        # in; dates without NYSE stocks have no breakpoints and get NaN, as the left merge used to leave them
         nyse_breakpoints = compute_nyse_breakpoints(monthly_data)
-        monthly_data = monthly_data.merge(nyse_breakpoints, on='date', how='left')
-
-        monthly_data['size_cat'] = np.where(monthly_data['mktcap'] <= monthly_data['size_median'], 'S', 'B')
-
-        monthly_data['vol_cat'] = np.where(monthly_data['volatility'] <= monthly_data['vol_30'], 'L',
-                                 np.where(monthly_data['volatility'] >= monthly_data['vol_70'], 'H', 'M'))
-
-        monthly_data['portfolio'] = monthly_data['size_cat'] + "/" + monthly_data['vol_cat']
+        breakpoint_dates = nyse_breakpoints['date'].to_numpy()
+        dates = monthly_data['date'].to_numpy()
+        if len(breakpoint_dates) == 0:  # no NYSE stocks at all: nothing to search or index
+            size_median = vol_30 = vol_70 = np.full(len(dates), np.nan)
+        else:
+            position = np.minimum(np.searchsorted(breakpoint_dates, dates), len(breakpoint_dates) - 1)
+            has_breakpoints = breakpoint_dates[position] == dates
+            size_median, vol_30, vol_70 = (np.where(has_breakpoints, nyse_breakpoints[col].to_numpy()[position],
+                                                    np.nan)
+                                           for col in ['size_median', 'vol_30', 'vol_70'])
+
+        # Size code 0 = S (at or below the NYSE median), 1 = B; volatility code 0 = L, 1 = M, 2 = H.
+        # The portfolio is a categorical built straight from the combined int8 code, one byte per row.
+        mktcap = monthly_data['mktcap'].to_numpy()
+        volatility = monthly_data['volatility'].to_numpy()
+        size_code = np.where(mktcap <= size_median, 0, 1).astype(np.int8)
+        vol_code = np.select([volatility <= vol_30, volatility >= vol_70], [0, 2], default=1).astype(np.int8)
+
+        monthly_data['portfolio'] = pd.Categorical.from_codes(3 * size_code + vol_code,
+                                                              categories=['S/L', 'S/M', 'S/H', 'B/L', 'B/M', 'B/H'])
 
         portfolio_returns = value_weighted_returns(monthly_data)
 
-        s_h = portfolio_returns[portfolio_returns['portfolio'] == 'S/H'][['date', 'vw_return']].rename(
-            columns={'vw_return': 'S_H'})
-
-        s_l = portfolio_returns[portfolio_returns['portfolio'] == 'S/L'][['date', 'vw_return']].rename(
-            columns={'vw_return': 'S_L'})
-
-        b_h = portfolio_returns[portfolio_returns['portfolio'] == 'B/H'][['date', 'vw_return']].rename(
-            columns={'vw_return': 'B_H'})
-
-        b_l = portfolio_returns[portfolio_returns['portfolio'] == 'B/L'][['date', 'vw_return']].rename(
-            columns={'vw_return': 'B_L'})
+        # One pivot puts the four corner portfolios side by side; dropping dates that miss any of them
+        # keeps only the dates the inner merges of the per-portfolio frames used to keep (reindexing keeps
+        # every portfolio's column even if none of its stocks occur, e.g. with no breakpoints at all)
+        wide = (portfolio_returns.pivot(index='date', columns='portfolio', values='vw_return')
+                                 .reindex(columns=monthly_data['portfolio'].cat.categories)
+                                 .dropna(subset=['S/H', 'S/L', 'B/H', 'B/L']))
 
-        self.df = s_h.merge(s_l, on='date', how='inner').merge(b_h, on='date', how='inner').merge(b_l, on='date', how='inner')
+        wide['vol'] = 0.5 * ((wide['S/H'] - wide['S/L']) + (wide['B/H'] - wide['B/L']))
 
-        self.df['vol'] = 0.5 * ((self.df['S_H'] - self.df['S_L']) + (self.df['B_H'] - self.df['B_L']))
-
-        self.df = self.df[['date', 'vol']]
+        self.df = wide[['vol']].rename_axis(columns=None).reset_index()
 
     def to_csv(self):
         """Write as a csv file under ./data folder"""
@@ -74,3 +81,11 @@ class VolFactor:
         data_folder = parent_path / "data"
 
         self.df.to_csv(data_folder / "vol_factor.csv", index=False)
+
+    def to_parquet(self):
+        """Write as a zstd-compressed parquet file under ./data folder"""
+        current_path = Path(os.getcwd()).resolve()
+        parent_path = current_path.parent
+        data_folder = parent_path / "data"
+
+        self.df.to_parquet(data_folder / "vol_factor.parquet", compression="zstd", index=False)
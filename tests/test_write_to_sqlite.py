@@ -0,0 +1,32 @@
+import os
+import sys
+import sqlite3
+
+import pandas as pd
+import pytest
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(parent_dir, "create_database"))
+import _utils
+
+
+def _written_rows(db_path, df, **to_sql_kwargs):
+    db_con = sqlite3.connect(db_path)
+    _utils.write_to_sqlite(df, name="t", db_con=db_con, **to_sql_kwargs)
+    db_con.commit()
+    rows = db_con.execute("SELECT date, typeof(date), value FROM t ORDER BY rowid").fetchall()
+    db_con.close()
+    return rows
+
+
+@pytest.mark.skipif(_utils.adbc_sqlite is None, reason="adbc-driver-sqlite is not installed")
+@pytest.mark.parametrize("date_dtype", ["datetime64[ns]", "timestamp[ns][pyarrow]"])
+def test_adbc_and_to_sql_store_the_same_dates(tmp_path, date_dtype):
+    df = pd.DataFrame({"date": pd.to_datetime(["2020-01-01", "2020-02-01", None]), "value": [1.0, 2.0, 3.0]})
+    df["date"] = df["date"].astype(date_dtype)
+
+    adbc_rows = _written_rows(tmp_path / "adbc.sqlite", df)
+    to_sql_rows = _written_rows(tmp_path / "to_sql.sqlite", df.astype({"date": "datetime64[ns]"}), index=False)
+
+    assert adbc_rows == to_sql_rows
+    assert adbc_rows[0][:2] == ("2020-01-01 00:00:00", "text")